@@ -10,6 +10,8 @@ Liberty Country — мощный музыкальный модуль (Music Cog)
 - Безопасное автодополнение (тип параметра str/int, варианты — через Choice в autocomplete).
 - Интеграция с веб-панелью: экспорт состояния в LC_STATE_FILE, чтение команд из LC_CONTROL_FILE.
 - Windows-safe запись/чтение файлов (fallback в %TEMP% при ошибках прав).
+- yt-dlp грузится с ленивыми экстракторами (YTDLP_NO_LAZY_EXTRACTORS сбрасывается перед импортом),
+  поэтому в память попадает только реально используемый YouTube-экстрактор.
 
 Важно:
 - НЕ используем аннотации Choice[...] в параметрах СЛЭШ-команд с autocomplete — это и было источником ошибки.
@@ -19,25 +21,49 @@ Liberty Country — мощный музыкальный модуль (Music Cog)
 from __future__ import annotations
 
 import asyncio
+import concurrent.futures
 import dataclasses
 import json
 import os
+import queue
 import random
+import shlex
+import sys
+import threading
 import time
+from collections import OrderedDict, deque
+from itertools import islice
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 
+import aiohttp  # зависимость discord.py
 import discord
 from discord import app_commands, Interaction
 from discord.ext import commands
 
 # --- yt-dlp (извлечение медиа)
+# Ленивые экстракторы включены в сборках yt-dlp по умолчанию, но отключаются переменной
+# YTDLP_NO_LAZY_EXTRACTORS — тогда импорт тянет все ~1800 классов. Сбрасываем её до импорта.
+os.environ.pop("YTDLP_NO_LAZY_EXTRACTORS", None)
 try:
     import yt_dlp as youtube_dl
 except Exception:  # pragma: no cover
     youtube_dl = None
 
+# --- orjson (быстрая сериализация состояния), иначе стандартный json
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+# --- inotify (Linux): уведомления об изменении control-файла вместо опроса
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except Exception:  # pragma: no cover
+    INotify = None
+
 
 # ==============================
 # Конфигурация / константы
@@ -51,20 +77,59 @@ YTDL_OPTS = {
     "extract_flat": False,
     "noplaylist": False,
     "source_address": "0.0.0.0",  # иногда помогает от сетевых проблем
+    # без таймаута сокета зависший запрос держит поток пула вечно (см. _run_ytdl)
+    "socket_timeout": 10,
 }
 
-FFMPEG_BEFORE = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
-FFMPEG_OPTS = "-vn"
+# Для поиска достаточно плоского списка: stream url выбранного трека
+# всё равно извлекается отдельно в _play_current_track
+YTDL_OPTS_FLAT = {**YTDL_OPTS, "extract_flat": "in_playlist", "noplaylist": True}
+
+# Формат источника известен (webm/opus или m4a от googlevideo) — долгий анализ входа не нужен,
+# он только задерживает первый пакет. Для одной аудиодорожки хватает одного потока.
+FFMPEG_BEFORE = (
+    "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+    " -nostdin -probesize 32k -analyzeduration 0 -fflags +nobuffer"
+)
+FFMPEG_OPTS = "-vn -loglevel quiet -application audio -threads 1"
 
 STATE_FILE = Path(os.getenv("LC_STATE_FILE", "lc_nowplaying.json")).resolve()
 CONTROL_FILE = Path(os.getenv("LC_CONTROL_FILE", "control_queue.jsonl")).resolve()
+FFMPEG_EXECUTABLE = os.getenv("LC_FFMPEG", "ffmpeg") or "ffmpeg"
+OPUS_BITRATE = 128  # kbps, как у discord.FFmpegOpusAudio
+OPUS_FRAME_BUFFER = 250  # ~5 секунд Opus-кадров по 20 мс
+OPUS_FRAME_SECONDS = 0.02  # длительность одного Opus-кадра (discord.opus.Encoder.FRAME_LENGTH)
+
 QUEUE_EXPORT_LIMIT = int(os.getenv("LC_QUEUE_EXPORT_LIMIT", "100") or "100")
+VOICE_RECONNECT_ATTEMPTS = 8
+PREFETCH_LEAD = 10  # сек до конца трека, когда заранее извлекаем stream url следующего
+PLAYER_IDLE_TTL = float(os.getenv("LC_PLAYER_IDLE_TTL", "900") or "900")  # сек до выгрузки простаивающего плеера
+CONTROL_POLL_INTERVAL = float(os.getenv("LC_CONTROL_POLL", "5") or "5")  # без inotify
+PATH_RECHECK_INTERVAL = 60  # сек между перепроверками путей state/control
+CONTROL_BATCH = 200  # команд за один проход, чтобы не занимать event loop надолго
+
+# Кэш результатов yt-dlp: ключ -> (значение, момент истечения)
+URL_CACHE_TTL = 300        # fallback, если в ссылке нет expire=
+URL_CACHE_MARGIN = 30      # запас до истечения ссылки googlevideo
+URL_CACHE_MAX = 256
+_URL_CACHE: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_SEARCH_CACHE: "OrderedDict[str, Tuple[List[dict], float]]" = OrderedDict()
+LYRICS_CACHE_TTL = 3600
+_LYRICS_CACHE: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+# Отдельный пул для yt-dlp (не занимаем default executor) и по одному YoutubeDL на поток
+YTDL_TIMEOUT = float(os.getenv("LC_YTDL_TIMEOUT", "20") or "20")
+_YDL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="ytdl")
+_YDL_LOCAL = threading.local()
+# общий лимит одновременных вызовов yt-dlp (таймаут считается уже после захвата)
+_YDL_SEMAPHORE = asyncio.Semaphore(2)
 
 # ==============================
 # Вспомогательные структуры
 # ==============================
 
-@dataclass
+# slots: без __dict__ у каждого трека в очереди (параметр dataclass есть с Python 3.10)
+@dataclass(**({"slots": True} if sys.version_info >= (3, 10) else {}))
 class Track:
     title: str
     url: str
@@ -74,19 +139,128 @@ class Track:
     thumbnail: Optional[str] = None
     # служебные:
     added_at: float = field(default_factory=time.time)
+    # кэш brief(): трек не меняется после постановки в очередь (requester_id задаётся сразу после поиска)
+    _brief: Optional[dict] = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def display_title(self) -> str:
         return self.title or self.webpage_url or self.url
 
     def brief(self) -> dict:
-        return {
-            "title": self.display_title,
-            "url": self.webpage_url or self.url,
-            "duration": self.duration,
-            "requester": self.requester_id,
-            "thumb": self.thumbnail,
-        }
+        if self._brief is None:
+            self._brief = {
+                "title": self.display_title,
+                "url": self.webpage_url or self.url,
+                "duration": self.duration,
+                "requester": self.requester_id,
+                "thumb": self.thumbnail,
+            }
+        return self._brief
+
+
+async def _ogg_packets(stream: asyncio.StreamReader):
+    """Асинхронно разобрать Ogg-поток ffmpeg на Opus-пакеты."""
+    partial = b""
+    while True:
+        try:
+            header = await stream.readexactly(27)
+            if header[:4] != b"OggS":
+                return
+            table = await stream.readexactly(header[26])
+            body = await stream.readexactly(sum(table))
+        except asyncio.IncompleteReadError:
+            return
+        offset = 0
+        for lace in table:
+            partial += body[offset:offset + lace]
+            offset += lace
+            if lace < 255:
+                yield partial
+                partial = b""
+
+
+class AsyncFFmpegOpusSource(discord.AudioSource):
+    """Opus-источник: ffmpeg запущен через asyncio.subprocess, stdout читается в event loop'е.
+
+    Плеер discord.py вызывает read() из своего потока, поэтому кадры передаются
+    через потокобезопасную queue.Queue; при заполненном буфере чтение ffmpeg ждёт.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, proc: asyncio.subprocess.Process):
+        self._loop = loop
+        self._proc = proc
+        self._frames: "queue.Queue[bytes]" = queue.Queue(maxsize=OPUS_FRAME_BUFFER)
+        self._space = asyncio.Event()
+        self._eof = False
+        self.frames_sent = 0  # отдано кадров в голос — по ним считается позиция (паузы не в счёт)
+        self._pump_task = loop.create_task(self._pump())
+
+    @classmethod
+    async def create(cls, src_url: str, *, before_options: str = "", options: str = "",
+                     codec: Optional[str] = None) -> "AsyncFFmpegOpusSource":
+        args = [
+            *shlex.split(before_options), "-i", src_url,
+            "-map_metadata", "-1", "-f", "opus",
+            "-c:a", "copy" if codec == "opus" else "libopus",
+            "-ar", "48000", "-ac", "2", "-b:a", f"{OPUS_BITRATE}k",
+            *shlex.split(options), "pipe:1",
+        ]
+        proc = await asyncio.create_subprocess_exec(
+            FFMPEG_EXECUTABLE, *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return cls(asyncio.get_running_loop(), proc)
+
+    async def _pump(self):
+        try:
+            async for packet in _ogg_packets(self._proc.stdout):
+                if packet.startswith((b"OpusHead", b"OpusTags")):
+                    continue
+                while True:
+                    try:
+                        self._frames.put_nowait(packet)
+                        break
+                    except queue.Full:
+                        self._space.clear()
+                        await self._space.wait()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._eof = True
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        # вызывается из потока AudioPlayer
+        while True:
+            try:
+                packet = self._frames.get(timeout=0.5)
+            except queue.Empty:
+                if self._eof and self._frames.empty():
+                    return b""
+                continue
+            if not self._space.is_set():
+                self._loop.call_soon_threadsafe(self._space.set)
+            self.frames_sent += 1
+            return packet
+
+    def cleanup(self):
+        # вызывается из потока AudioPlayer после остановки
+        try:
+            self._loop.call_soon_threadsafe(self._close)
+        except RuntimeError:
+            pass  # loop уже закрыт
+
+    def _close(self):
+        self._pump_task.cancel()
+        if self._proc.returncode is None:
+            try:
+                self._proc.kill()
+            except ProcessLookupError:
+                pass
 
 
 class GuildPlayer:
@@ -95,15 +269,70 @@ class GuildPlayer:
     def __init__(self, bot: commands.Bot, guild_id: int):
         self.bot = bot
         self.guild_id = guild_id
-        self.queue: List[Track] = []
+        self._state_version = 0  # растёт при каждом изменении, см. export_state
+        self.last_touch = time.monotonic()  # последняя активность, см. MusicPower._evict_idle_players
+        self.on_active: Optional[Callable[[int], None]] = None  # cog двигает плеер в конец LRU
+        self.queue: Deque[Track] = deque()
         self.volume: int = 100
         self.loop_mode: str = "off"  # off | track | queue | auto
         self.current: Optional[Track] = None
         self.voice: Optional[discord.VoiceClient] = None
+        self._channel: Optional[discord.abc.Connectable] = None  # канал для переподключения
         self.lock = asyncio.Lock()
         self.next_event = asyncio.Event()
+        self._queue_nonempty = asyncio.Event()  # взводится в q_add, будит _player_loop
+        self._ac_choices_cache: Optional[List[app_commands.Choice[int]]] = None
         self._play_task: Optional[asyncio.Task] = None
         self._vc_ready = asyncio.Event()
+        # позиция текущего трека (для перезапуска потока при смене громкости)
+        self._play_gen = 0
+        self._play_offset = 0.0
+        self._source: Optional[AsyncFFmpegOpusSource] = None
+        self._play_volume = 100
+        self._restart_task: Optional[asyncio.Task] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+
+    # ---- версия состояния (для экспорта только изменений)
+    def _touch(self):
+        self._state_version += 1
+        self._ac_choices_cache = None
+        self.mark_active()
+
+    def mark_active(self):
+        self.last_touch = time.monotonic()
+        if self.on_active is not None:
+            self.on_active(self.guild_id)
+
+    def ac_choices(self) -> List[app_commands.Choice[int]]:
+        """Варианты автодополнения «номер трека» (первые 25), кэш до изменения очереди."""
+        if self._ac_choices_cache is None:
+            self._ac_choices_cache = [
+                app_commands.Choice(name=f"{i}. {t.display_title[:90]}", value=i)
+                for i, t in enumerate(islice(self.queue, 25), start=1)
+            ]
+        return self._ac_choices_cache
+
+    def is_idle(self) -> bool:
+        """Не подключён, ничего не играет и очередь пуста."""
+        return self.voice is None and self.current is None and not self.queue
+
+    @property
+    def current(self) -> Optional[Track]:
+        return self._current
+
+    @current.setter
+    def current(self, track: Optional[Track]):
+        self._current = track
+        self._touch()
+
+    @property
+    def loop_mode(self) -> str:
+        return self._loop_mode
+
+    @loop_mode.setter
+    def loop_mode(self, mode: str):
+        self._loop_mode = mode
+        self._touch()
 
     # ---- очередь / управление
     def q_len(self) -> int:
@@ -111,30 +340,45 @@ class GuildPlayer:
 
     def q_clear(self):
         self.queue.clear()
+        self._queue_nonempty.clear()
+        self._touch()
 
     def q_add(self, track: Track, to_front: bool = False):
         if to_front:
-            self.queue.insert(0, track)
+            self.queue.appendleft(track)
         else:
             self.queue.append(track)
+        self._queue_nonempty.set()
+        self._touch()
 
     def q_move(self, src: int, dst: int) -> bool:
         """1-based индексы."""
         i, j = src - 1, dst - 1
         if i < 0 or j < 0 or i >= len(self.queue) or j >= len(self.queue):
             return False
-        item = self.queue.pop(i)
+        item = self.queue[i]
+        del self.queue[i]
         self.queue.insert(j, item)
+        self._touch()
         return True
 
     def q_remove(self, index: int) -> Optional[Track]:
         i = index - 1
         if 0 <= i < len(self.queue):
-            return self.queue.pop(i)
+            track = self.queue[i]
+            del self.queue[i]
+            if not self.queue:
+                self._queue_nonempty.clear()
+            self._touch()
+            return track
         return None
 
     def q_shuffle(self):
-        random.shuffle(self.queue)
+        # индексация deque в середине O(n) — перемешиваем список и пересобираем
+        items = list(self.queue)
+        random.shuffle(items)
+        self.queue = deque(items)
+        self._touch()
 
     # ---- голос / плеер
     async def ensure_voice(self, interaction: Interaction, move: bool = False):
@@ -153,15 +397,19 @@ class GuildPlayer:
                 await self.voice.move_to(channel)
         else:
             self.voice = await channel.connect()
+        self._channel = channel
         self._vc_ready.set()
+        self.mark_active()
 
     async def disconnect(self):
-        self.queue.clear()
+        self.cancel_prefetch()
+        self.q_clear()
         self.current = None
         self.next_event.set()
         if self.voice and self.voice.is_connected():
             await self.voice.disconnect(force=True)
         self.voice = None
+        self._channel = None
         self._vc_ready.clear()
 
     async def start_player_loop(self):
@@ -179,10 +427,11 @@ class GuildPlayer:
                 # если ничего не играет — берём из очереди
                 if self.current is None:
                     if not self.queue:
-                        # нет треков — ждём новый и паузим цикл
-                        await asyncio.sleep(0.5)
+                        # нет треков — спим до следующего q_add
+                        await self._queue_nonempty.wait()
+                        self._queue_nonempty.clear()
                         continue
-                    self.current = self.queue.pop(0)
+                    self.current = self.queue.popleft()
 
                 # воспроизводим текущий трек
                 await self._play_current_track()
@@ -196,7 +445,7 @@ class GuildPlayer:
                     pass
                 elif self.loop_mode == "queue" and self.current:
                     self.queue.append(self.current)
-                    self.current = None
+                    self.current = None  # setter отмечает изменение и для очереди
                 else:
                     # off / auto
                     self.current = None
@@ -207,7 +456,7 @@ class GuildPlayer:
                 # чтобы цикл не умирал
                 await asyncio.sleep(1)
 
-    async def _play_current_track(self):
+    async def _play_current_track(self, seek: float = 0.0):
         if not self.voice or not self.current:
             return
         track = self.current
@@ -219,25 +468,131 @@ class GuildPlayer:
             self.next_event.set()
             return
 
+        self._play_gen += 1
+        gen = self._play_gen
+
         def _after_play(err: Optional[Exception]):
             # коллбек вызывается не в event loop'е
+            if gen != self._play_gen:
+                # источник заменён перезапуском (смена громкости) — трек не закончился
+                return
             try:
                 self.bot.loop.call_soon_threadsafe(self.next_event.set)
             except Exception:
                 pass
 
-        audio = discord.FFmpegPCMAudio(
-            src_url,
-            before_options=FFMPEG_BEFORE,
-            options=FFMPEG_OPTS,
-        )
-        source = discord.PCMVolumeTransformer(audio, volume=self.volume / 100.0)
-        self.voice.play(source, after=_after_play)
+        # Opus отдаётся в голос напрямую; громкость — фильтром ffmpeg, без покадровой работы в Python.
+        # С фильтром copy невозможен, поэтому codec подсказываем только при 100%.
+        before = FFMPEG_BEFORE + (f" -ss {seek:.2f}" if seek > 0 else "")
+        options = FFMPEG_OPTS
+        codec = _stream_codec(src_url)
+        self._play_volume = self.volume
+        if self.volume != 100:
+            options += f" -af volume={self.volume / 100.0:.2f}"
+            codec = None
+        source = await AsyncFFmpegOpusSource.create(src_url, codec=codec, before_options=before, options=options)
+        if gen != self._play_gen or not self.voice:
+            # пока запускался ffmpeg, трек сменили или отключились
+            source.cleanup()
+            return
+        self._play_offset = seek
+        self._source = source
+        try:
+            self.voice.play(source, after=_after_play)
+            self._start_prefetch(track.duration - seek)
+        except discord.ClientException:
+            source.cleanup()
+            if self.voice.is_connected():
+                raise
+            # голосовое соединение упало — восстанавливаем и продолжаем с той же позиции
+            if await self._reconnect_backoff():
+                await self._play_current_track(seek=seek)
+            elif self._channel is not None:
+                # трек возвращаем в начало очереди — после /music join он сыграет снова
+                # (если же бота выгнали через leave, очередь уже очищена — ничего не возвращаем)
+                self.q_add(track, to_front=True)
+                self.current = None
+                self.voice = None
+                self._vc_ready.clear()
+                self.next_event.set()
+
+    def _start_prefetch(self, remaining: float):
+        self.cancel_prefetch()
+        self._prefetch_task = asyncio.create_task(self._prefetch_next(remaining))
+
+    def cancel_prefetch(self):
+        """Отменить прогрев следующего трека (stop / leave — иначе он займёт слот yt-dlp впустую)."""
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
+
+    async def _prefetch_next(self, remaining: float):
+        """Заранее прогреть кэш stream url следующего трека, чтобы не было паузы между треками."""
+        try:
+            await asyncio.sleep(max(0.0, remaining - PREFETCH_LEAD))
+            if self.queue:
+                nxt = self.queue[0]
+                await extract_audio_url(nxt.url or nxt.webpage_url)
+        except asyncio.CancelledError:
+            pass
+
+    async def _reconnect_backoff(self) -> bool:
+        """Переподключиться к голосовому каналу с экспоненциальной задержкой."""
+        # канал читаем на каждой попытке: leave (disconnect) обнуляет его — тогда бросаем попытки
+        for attempt in range(VOICE_RECONNECT_ATTEMPTS):
+            await asyncio.sleep(min(60, 2 ** attempt + random.random() * 0.5))
+            channel = self._channel
+            if channel is None:
+                return False
+            try:
+                if self.voice:
+                    await self.voice.disconnect(force=True)
+                vc = await channel.connect(reconnect=True, timeout=15.0)
+            except (discord.ClientException, asyncio.TimeoutError, OSError):
+                continue
+            if self._channel is None:
+                # leave пришёл во время connect() — новое соединение не нужно
+                await vc.disconnect(force=True)
+                return False
+            self.voice = vc
+            return True
+        print(f"[music] guild {self.guild_id}: не удалось переподключиться к голосу "
+              f"после {VOICE_RECONNECT_ATTEMPTS} попыток")
+        return False
+
+    def position(self) -> float:
+        """Позиция текущего трека в секундах: точка старта + реально отданные в голос кадры."""
+        if self._source is None:
+            return self._play_offset
+        return self._play_offset + self._source.frames_sent * OPUS_FRAME_SECONDS
+
+    async def _restart_current(self):
+        """Пересоздать источник текущего трека с той же позиции (новая громкость)."""
+        # цикл — на случай, если громкость снова поменяли, пока запускался ffmpeg
+        try:
+            while self.voice and self.current and self._play_volume != self.volume:
+                paused = self.voice.is_paused()
+                if not (paused or self.voice.is_playing()):
+                    return
+                pos = self.position()
+                self._play_gen += 1  # старый after-коллбек не должен переключать трек
+                self.voice.stop()
+                await self._play_current_track(seek=pos)
+                if paused and self.voice:
+                    self.voice.pause()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # старый источник уже остановлен, новый не запустился — отпускаем _player_loop дальше
+            self.next_event.set()
 
     def set_volume(self, vol: int):
         self.volume = max(1, min(200, vol))
-        if self.voice and self.voice.source and isinstance(self.voice.source, discord.PCMVolumeTransformer):
-            self.voice.source.volume = self.volume / 100.0
+        self._touch()
+        if self._restart_task and not self._restart_task.done():
+            return  # уже перезапускается и подхватит новое значение
+        if self.voice and self.current and (self.voice.is_playing() or self.voice.is_paused()):
+            self._restart_task = asyncio.create_task(self._restart_current())
 
 
 # ==============================
@@ -258,31 +613,126 @@ def _safe_file(path: Path) -> Path:
         return fallback
 
 
+def _ydl(flat: bool = False):
+    """YoutubeDL текущего потока пула: создаётся один раз и переиспользуется."""
+    attr = "ydl_flat" if flat else "ydl"
+    ydl = getattr(_YDL_LOCAL, attr, None)
+    if ydl is None:
+        ydl = youtube_dl.YoutubeDL(YTDL_OPTS_FLAT if flat else YTDL_OPTS)
+        setattr(_YDL_LOCAL, attr, ydl)
+    return ydl
+
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line.decode("utf-8", "ignore"))
+
+
+def _write_atomic(path: Path, payload: bytes):
+    """Записать файл через временный + os.replace, чтобы панель не читала обрывок."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(payload)
+    try:
+        os.replace(tmp, path)
+    except PermissionError:
+        # Windows: цель открыта читателем — пишем напрямую
+        path.write_bytes(payload)
+        tmp.unlink(missing_ok=True)
+
+
+async def _run_ytdl(fn):
+    """Выполнить вызов yt-dlp в пуле с таймаутом; при зависании новые вызовы идут в новый пул."""
+    global _YDL_EXECUTOR
+    loop = asyncio.get_running_loop()
+    async with _YDL_SEMAPHORE:
+        executor = _YDL_EXECUTOR
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(executor, fn), timeout=YTDL_TIMEOUT)
+        except asyncio.TimeoutError:
+            # поток прервать нельзя: старый пул бросаем, чтобы он не держал новые запросы,
+            # а завершится поток сам — по socket_timeout из YTDL_OPTS
+            if executor is _YDL_EXECUTOR:
+                executor.shutdown(wait=False)
+                _YDL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="ytdl")
+            raise
+
+
+def _cache_get(cache: OrderedDict, key: str):
+    """Вернуть значение из кэша, если оно ещё не истекло."""
+    hit = cache.get(key)
+    if hit is None:
+        return None
+    value, expiry = hit
+    if time.time() >= expiry:
+        cache.pop(key, None)
+        return None
+    return value
+
+
+def _cache_put(cache: OrderedDict, key: str, value, expiry: float):
+    cache[key] = (value, expiry)
+    cache.move_to_end(key)
+    while len(cache) > URL_CACHE_MAX:
+        cache.popitem(last=False)
+
+
+def _stream_expiry(url: str) -> float:
+    """Момент истечения прямой ссылки (параметр expire= у googlevideo)."""
+    try:
+        expire = parse_qs(urlparse(url).query).get("expire", [None])[0]
+        if expire:
+            return float(expire) - URL_CACHE_MARGIN
+    except Exception:
+        pass
+    return time.time() + URL_CACHE_TTL
+
+
+def _stream_codec(url: str) -> Optional[str]:
+    """'opus' для webm-потоков googlevideo (mime=audio/webm) — их можно отдавать без перекодирования."""
+    try:
+        mime = parse_qs(urlparse(url).query).get("mime", [""])[0]
+    except Exception:
+        return None
+    return "opus" if mime == "audio/webm" else None
+
+
 async def extract_audio_url(query: str) -> Optional[str]:
     """Получить прямой url аудио-потока через yt-dlp (в executor)."""
     if youtube_dl is None:
         return None
 
-    loop = asyncio.get_running_loop()
+    cached = _cache_get(_URL_CACHE, query)
+    if cached:
+        return cached
 
     def _extract() -> Optional[str]:
-        with youtube_dl.YoutubeDL(YTDL_OPTS) as ydl:
-            info = ydl.extract_info(query, download=False)
-            if info is None:
-                return None
-            if "entries" in info:  # плейлист или поиск
-                # берём первый элемент
-                info = info["entries"][0]
-            url = info.get("url")
-            if not url and "formats" in info and info["formats"]:
-                # fallback к первому формату
-                url = info["formats"][0].get("url")
-            return url
+        info = _ydl().extract_info(query, download=False)
+        if info is None:
+            return None
+        if "entries" in info:  # плейлист или поиск
+            # берём первый элемент
+            info = info["entries"][0]
+        url = info.get("url")
+        if not url and "formats" in info and info["formats"]:
+            # fallback к первому формату
+            url = info["formats"][0].get("url")
+        return url
 
     try:
-        return await loop.run_in_executor(None, _extract)
+        url = await _run_ytdl(_extract)
     except Exception:
         return None
+    if url:
+        _cache_put(_URL_CACHE, query, url, _stream_expiry(url))
+    return url
 
 
 async def ytdl_search(query: str) -> List[Track]:
@@ -291,21 +741,23 @@ async def ytdl_search(query: str) -> List[Track]:
     if youtube_dl is None:
         return results
 
-    loop = asyncio.get_running_loop()
-
-    def _extract_all() -> List[dict]:
-        with youtube_dl.YoutubeDL(YTDL_OPTS) as ydl:
-            info = ydl.extract_info(query, download=False)
-            if info is None:
-                return []
-            if "entries" in info:
-                return [e for e in info["entries"] if e]
-            return [info]
-
-    try:
-        items = await loop.run_in_executor(None, _extract_all)
-    except Exception:
-        items = []
+    key = query.strip()
+    if not key.startswith("http"):
+        key = " ".join(key.lower().split())
+    items = _cache_get(_SEARCH_CACHE, key)
+    if items is None:
+        # в кэше держим только нужные поля, без списка formats
+        items = [{
+            "title": it.get("title"),
+            "url": it.get("url"),
+            "webpage_url": it.get("webpage_url"),
+            "duration": it.get("duration"),
+            "abr": it.get("abr"),
+            # у плоских записей вместо thumbnail только список thumbnails
+            "thumbnail": it.get("thumbnail") or ((it.get("thumbnails") or [{}])[-1].get("url")),
+        } for it in await _search_items(query)]
+        if items:
+            _cache_put(_SEARCH_CACHE, key, items, time.time() + URL_CACHE_TTL)
 
     for it in items:
         title = it.get("title") or "Untitled"
@@ -318,15 +770,46 @@ async def ytdl_search(query: str) -> List[Track]:
     return results
 
 
-def export_state(players: Dict[int, GuildPlayer]):
-    """Экспорт состояния плееров в JSON для панели."""
-    path = _safe_file(STATE_FILE)
+async def _search_items(query: str) -> List[dict]:
+    """Сырые info-словари yt-dlp для запроса (в executor)."""
+
+    def _extract_all() -> List[dict]:
+        info = _ydl(flat=True).extract_info(query, download=False)
+        if info is None:
+            return []
+        if "entries" in info:
+            return [e for e in info["entries"] if e]
+        return [info]
+
+    try:
+        return await _run_ytdl(_extract_all)
+    except Exception:
+        return []
+
+
+def export_state(players: Dict[int, GuildPlayer],
+                 cache: Optional[Dict[int, Tuple[int, dict]]] = None,
+                 force: bool = False,
+                 path: Optional[Path] = None):
+    """Экспорт состояния плееров в JSON для панели.
+
+    cache хранит (версия, данные) по гильдиям между вызовами: неизменённые плееры
+    не сериализуются заново, а если не изменилось ничего — файл не переписывается.
+    """
+    if cache is None:
+        cache, force = {}, True
+
+    changed = force or cache.keys() != players.keys()
+    for gid in [g for g in cache if g not in players]:
+        del cache[gid]
 
-    data: Dict[str, dict] = {}
     for gid, gp in players.items():
+        hit = cache.get(gid)
+        if hit is not None and hit[0] == gp._state_version:
+            continue
         cur = gp.current
-        queue_list = [t.brief() for t in gp.queue[:QUEUE_EXPORT_LIMIT]]
-        data[str(gid)] = {
+        queue_list = [t.brief() for t in islice(gp.queue, QUEUE_EXPORT_LIMIT)]
+        cache[gid] = (gp._state_version, {
             "guild_id": gid,
             "title": cur.display_title if cur else None,
             "url": (cur.webpage_url or cur.url) if cur else None,
@@ -337,10 +820,17 @@ def export_state(players: Dict[int, GuildPlayer]):
             "queue_len": gp.q_len(),
             "queue": queue_list,
             "ts": int(time.time()),
-        }
+        })
+        changed = True
+
+    if not changed:
+        return
 
+    data: Dict[str, dict] = {str(gid): entry for gid, (_, entry) in cache.items()}
+    if path is None:
+        path = _safe_file(STATE_FILE)
     try:
-        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        _write_atomic(path, _dumps(data))
     except Exception:
         pass
 
@@ -351,6 +841,10 @@ def export_state(players: Dict[int, GuildPlayer]):
 
 music_group = app_commands.Group(name="music", description="Музыкальные команды Liberty Country")
 
+# неизменные варианты автодополнения — собираем один раз
+_AC_DST_CHOICES = [app_commands.Choice(name=f"→ {i}", value=i) for i in range(1, 26)]
+_AC_VOLUME_CHOICES = [app_commands.Choice(name=f"{v}%", value=v) for v in (10, 25, 50, 75, 100, 125, 150, 175, 200)]
+
 
 # ==============================
 # Cog
@@ -361,20 +855,55 @@ class MusicPower(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.players: Dict[int, GuildPlayer] = {}
+        self.players: "OrderedDict[int, GuildPlayer]" = OrderedDict()  # LRU: недавние — в конце
         self._export_task: Optional[asyncio.Task] = None
         self._control_task: Optional[asyncio.Task] = None
         self._control_pos = 0  # позиция чтения control_queue.jsonl
+        self._export_cache: Dict[int, Tuple[int, dict]] = {}
+        self._http: Optional[aiohttp.ClientSession] = None  # общая сессия (lrclib и т.п.)
+        self._inotify = None
+        # пути разрешаются один раз (mkdir/touch/fallback) и перепроверяются раз в минуту
+        self._state_path = _safe_file(STATE_FILE)
+        self._control_path = _safe_file(CONTROL_FILE)
+        self._paths_checked = time.monotonic()
+        self._export_force = True  # при старте переписываем файл целиком (в нём могло остаться старое состояние)
+        self._control_changed: Optional[asyncio.Event] = None  # событие inotify для _control_loop
 
     # --------- сервисные
     def get_player(self, guild_id: int) -> GuildPlayer:
-        if guild_id not in self.players:
-            self.players[guild_id] = GuildPlayer(self.bot, guild_id)
-        return self.players[guild_id]
+        gp = self.players.get(guild_id)
+        if gp is None:
+            gp = self.players[guild_id] = GuildPlayer(self.bot, guild_id)
+            gp.on_active = self._player_active
+        else:
+            gp.mark_active()
+        return gp
+
+    def _player_active(self, guild_id: int):
+        # порядок players совпадает с порядком last_touch: свежие — в конце
+        if guild_id in self.players:
+            self.players.move_to_end(guild_id)
+
+    def _evict_idle_players(self):
+        """Выгрузить плееры, простаивающие дольше PLAYER_IDLE_TTL."""
+        deadline = time.monotonic() - PLAYER_IDLE_TTL
+        for gid, gp in list(self.players.items()):
+            if gp.last_touch > deadline:
+                break  # дальше только более свежие
+            if not gp.is_idle():
+                continue
+            for task in (gp._play_task, gp._restart_task, gp._prefetch_task):
+                if task and not task.done():
+                    task.cancel()
+            del self.players[gid]
 
     async def cog_load(self):
         # регистрируем группу /music
         self.bot.tree.add_command(music_group)
+        self._http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=8),
+            headers={"User-Agent": "LibertyCountryBot"},
+        )
         # периодический экспорт состояния (каждые 3 сек)
         self._export_task = asyncio.create_task(self._export_loop(), name="music-export")
         # чтение внешней очереди команд (панель)
@@ -389,42 +918,129 @@ class MusicPower(commands.Cog):
             self._export_task.cancel()
         if self._control_task:
             self._control_task.cancel()
+        self._unwatch_control()
+        if self._http:
+            await self._http.close()
+            self._http = None
+
+    def _recheck_paths(self):
+        """Раз в PATH_RECHECK_INTERVAL заново проверить файлы (их могли удалить или перенести)."""
+        now = time.monotonic()
+        if now - self._paths_checked < PATH_RECHECK_INTERVAL:
+            return
+        self._paths_checked = now
+        state_path = _safe_file(STATE_FILE)
+        if state_path != self._state_path:
+            self._state_path = state_path
+            self._export_force = True  # новый файл — записать целиком
+        control_path = _safe_file(CONTROL_FILE)
+        if control_path != self._control_path:
+            self._control_path = control_path
+            if self._control_changed is not None:
+                self._control_changed.set()  # разбудить _control_loop, чтобы он переподписался
+        try:
+            if self._control_path.stat().st_size < self._control_pos:
+                self._control_pos = 0  # файл пересоздан/усечён — читаем сначала
+        except OSError:
+            pass
 
     async def _export_loop(self):
         while True:
             try:
-                export_state(self.players)
+                self._recheck_paths()
+                self._evict_idle_players()
+                export_state(self.players, self._export_cache, force=self._export_force, path=self._state_path)
+                self._export_force = False
                 await asyncio.sleep(3)
             except asyncio.CancelledError:
                 break
             except Exception:
                 await asyncio.sleep(3)
 
+    def _watch_control(self, ctrl: Path) -> Optional[asyncio.Event]:
+        """Подписаться на изменения control-файла через inotify; None — если недоступно."""
+        if INotify is None:
+            return None
+        changed = asyncio.Event()
+        try:
+            ino = INotify()
+            ino.add_watch(str(ctrl.parent), inotify_flags.MODIFY | inotify_flags.CREATE | inotify_flags.MOVED_TO)
+        except Exception:
+            return None
+
+        def _on_events():
+            try:
+                events = ino.read(timeout=0)
+            except Exception:
+                return
+            if any(ev.name == ctrl.name for ev in events):
+                changed.set()
+
+        try:
+            asyncio.get_running_loop().add_reader(ino.fileno(), _on_events)
+        except (NotImplementedError, RuntimeError):
+            ino.close()
+            return None
+        self._inotify = ino
+        changed.set()  # первое чтение — сразу
+        return changed
+
+    def _unwatch_control(self):
+        if self._inotify is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._inotify.fileno())
+        except Exception:
+            pass
+        self._inotify.close()
+        self._inotify = None
+
     async def _control_loop(self):
         """Читает control_queue.jsonl и выполняет команды (от панели)."""
-        ctrl = _safe_file(CONTROL_FILE)
+        ctrl = self._control_path
         # при первом запуске начинаем читать с конца файла
         try:
             self._control_pos = ctrl.stat().st_size
         except Exception:
             self._control_pos = 0
+        changed = self._control_changed = self._watch_control(ctrl)
+        backlog = False  # в прошлый проход упёрлись в CONTROL_BATCH
 
         while True:
             try:
-                await asyncio.sleep(1.0)
-                ctrl = _safe_file(CONTROL_FILE)
+                if backlog:
+                    await asyncio.sleep(0)
+                elif changed is None:
+                    await asyncio.sleep(CONTROL_POLL_INTERVAL)
+                else:
+                    await changed.wait()
+                    changed.clear()
+                backlog = False
+                if self._control_path != ctrl:
+                    # _recheck_paths сменил путь (например, fallback в TEMP) — переподписываемся
+                    self._unwatch_control()
+                    ctrl = self._control_path
+                    self._control_pos = ctrl.stat().st_size
+                    changed = self._control_changed = self._watch_control(ctrl)
+                    continue
+                # читаем построчно, без загрузки всего добавленного куска в память
                 with ctrl.open("rb") as f:
                     f.seek(self._control_pos)
-                    raw = f.read()
-                    self._control_pos = f.tell()
-                if not raw:
-                    continue
-                for line in raw.splitlines():
-                    try:
-                        evt = json.loads(line.decode("utf-8", "ignore"))
-                        await self._apply_control(evt)
-                    except Exception:
-                        continue
+                    processed = 0
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # строка ещё дописывается — дочитаем в следующий раз
+                        self._control_pos += len(line)
+                        if not line.strip():
+                            continue
+                        try:
+                            await self._apply_control(_loads(line))
+                        except Exception:
+                            pass
+                        processed += 1
+                        if processed >= CONTROL_BATCH:
+                            backlog = True
+                            break
             except asyncio.CancelledError:
                 break
             except Exception:
@@ -448,7 +1064,8 @@ class MusicPower(commands.Cog):
             elif action == "skip" and gp.voice:
                 gp.voice.stop()
             elif action == "stop" and gp.voice:
-                gp.queue.clear()
+                gp.cancel_prefetch()
+                gp.q_clear()
                 gp.current = None
                 gp.voice.stop()
             elif action == "shuffle":
@@ -477,7 +1094,8 @@ class MusicPower(commands.Cog):
             if not query:
                 return
             # создаём Track(и)
-            items = await ytdl_search(query if query.startswith("http") else f"ytsearch:{query}")
+            async with gp.lock:  # поиски одной гильдии — по очереди
+                items = await ytdl_search(query if query.startswith("http") else f"ytsearch:{query}")
             for t in items[:1]:  # добавляем только первый найденный
                 t.requester_id = int(payload.get("user_id") or 0)
                 gp.q_add(t, to_front=(action == "playtop"))
@@ -525,7 +1143,8 @@ class MusicPower(commands.Cog):
             await interaction.followup.send("Укажите запрос или ссылку.")
             return
 
-        items = await ytdl_search(q if q.startswith("http") else f"ytsearch:{q}")
+        async with gp.lock:  # поиски одной гильдии — по очереди
+            items = await ytdl_search(q if q.startswith("http") else f"ytsearch:{q}")
         if not items:
             await interaction.followup.send("Ничего не найдено.")
             return
@@ -551,7 +1170,8 @@ class MusicPower(commands.Cog):
         gp = self.get_player(interaction.guild_id)
         await gp.ensure_voice(interaction, move=True)
         q = query.strip()
-        items = await ytdl_search(q if q.startswith("http") else f"ytsearch:{q}")
+        async with gp.lock:
+            items = await ytdl_search(q if q.startswith("http") else f"ytsearch:{q}")
         if not items:
             await interaction.followup.send("Ничего не найдено.")
             return
@@ -597,7 +1217,8 @@ class MusicPower(commands.Cog):
     @music_group.command(name="stop", description="Остановить и очистить очередь")
     async def cmd_stop(self, interaction: Interaction):
         gp = self.get_player(interaction.guild_id)
-        gp.queue.clear()
+        gp.cancel_prefetch()
+        gp.q_clear()
         gp.current = None
         if gp.voice:
             gp.voice.stop()
@@ -613,7 +1234,7 @@ class MusicPower(commands.Cog):
         if gp.current:
             lines.append(f"**Сейчас:** {gp.current.display_title}  ·  🔊 {gp.volume}%  ·  🔁 {gp.loop_mode}")
         if gp.queue:
-            for i, t in enumerate(gp.queue[:20], start=1):
+            for i, t in enumerate(islice(gp.queue, 20), start=1):
                 lines.append(f"`{i:02}` {t.display_title}")
             if gp.q_len() > 20:
                 lines.append(f"... + ещё {gp.q_len()-20}")
@@ -632,11 +1253,7 @@ class MusicPower(commands.Cog):
 
     @cmd_remove.autocomplete("index")
     async def ac_remove(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
-        gp = self.get_player(interaction.guild_id)
-        out: List[app_commands.Choice[int]] = []
-        for i, t in enumerate(gp.queue[:25], start=1):
-            out.append(app_commands.Choice(name=f"{i}. {t.display_title[:90]}", value=i))
-        return out
+        return self.get_player(interaction.guild_id).ac_choices()
 
     @music_group.command(name="move", description="Переместить трек в очереди")
     @app_commands.describe(src="Откуда (1..N)", dst="Куда (1..N)")
@@ -647,15 +1264,12 @@ class MusicPower(commands.Cog):
 
     @cmd_move.autocomplete("src")
     async def ac_move_src(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
-        gp = self.get_player(interaction.guild_id)
-        return [app_commands.Choice(name=f"{i}. {t.display_title[:90]}", value=i)
-                for i, t in enumerate(gp.queue[:25], start=1)]
+        return self.get_player(interaction.guild_id).ac_choices()
 
     @cmd_move.autocomplete("dst")
     async def ac_move_dst(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
         gp = self.get_player(interaction.guild_id)
-        n = min(len(gp.queue), 25)
-        return [app_commands.Choice(name=f"→ {i}", value=i) for i in range(1, n + 1)]
+        return _AC_DST_CHOICES[:len(gp.queue)]
 
     @music_group.command(name="clear", description="Очистить очередь")
     async def cmd_clear(self, interaction: Interaction):
@@ -691,8 +1305,7 @@ class MusicPower(commands.Cog):
 
     @cmd_volume.autocomplete("level")
     async def ac_volume(self, interaction: Interaction, current: str) -> List[app_commands.Choice[int]]:
-        presets = [10, 25, 50, 75, 100, 125, 150, 175, 200]
-        return [app_commands.Choice(name=f"{v}%", value=v) for v in presets]
+        return _AC_VOLUME_CHOICES
 
     @music_group.command(name="nowplaying", description="Что сейчас играет")
     async def cmd_nowplaying(self, interaction: Interaction):
@@ -729,25 +1342,35 @@ class MusicPower(commands.Cog):
         await interaction.response.send_message(f"**{q}**\n\n{txt}")
 
     async def _fetch_lyrics(self, title: str) -> Optional[str]:
-        # без внешних зависимостей: пробуем aiohttp из discord.py
-        import aiohttp
+        key = " ".join(title.lower().split())
+        cached = _cache_get(_LYRICS_CACHE, key)
+        if cached:
+            return cached
+        txt = await self._request_lyrics(title)
+        if txt:
+            _cache_put(_LYRICS_CACHE, key, txt, time.time() + LYRICS_CACHE_TTL)
+        return txt
+
+    async def _request_lyrics(self, title: str) -> Optional[str]:
+        # aiohttp из discord.py, сессия общая на весь cog
+        if self._http is None or self._http.closed:
+            return None
         params = {"track_name": title}
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=8)) as sess:
-                async with sess.get("https://lrclib.net/api/search", params=params) as r:
-                    if r.status != 200:
-                        return None
-                    arr = await r.json()
-                    if not arr:
-                        return None
-                    for it in arr:
-                        if it.get("plainLyrics"):
-                            return it["plainLyrics"]
-                        if it.get("syncedLyrics"):
-                            # вернуть plain из synced, если надо
-                            lines = [ln.split("]", 1)[-1].strip() for ln in it["syncedLyrics"].splitlines() if "]" in ln]
-                            return "\n".join(lines)
+            async with self._http.get("https://lrclib.net/api/search", params=params) as r:
+                if r.status != 200:
+                    return None
+                arr = await r.json()
+                if not arr:
                     return None
+                for it in arr:
+                    if it.get("plainLyrics"):
+                        return it["plainLyrics"]
+                    if it.get("syncedLyrics"):
+                        # вернуть plain из synced, если надо
+                        lines = [ln.split("]", 1)[-1].strip() for ln in it["syncedLyrics"].splitlines() if "]" in ln]
+                        return "\n".join(lines)
+                return None
         except Exception:
             return None
 
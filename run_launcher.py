@@ -1,57 +1,141 @@
+import argparse
+import multiprocessing
 import os
+import runpy
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-def run_process(name, command):
+# Интерпретатор для дочерних процессов — определяется один раз.
+# abspath, а не realpath: в venv python — симлинк, и его разворачивание теряет окружение.
+_PY = os.path.abspath(sys.executable)
+
+# POSIX: сервисы стартуют форками от forkserver'а, который заранее импортировал тяжёлые
+# общие зависимости (бот — discord/aiohttp, админка и сайт — fastapi/starlette/jinja2/httpx).
+# Недостающие модули forkserver просто пропускает. На Windows forkserver нет.
+try:
+    _MP = multiprocessing.get_context("forkserver")
+    _MP.set_forkserver_preload(["discord", "aiohttp", "fastapi", "starlette", "jinja2", "httpx", "uvicorn"])
+except ValueError:
+    _MP = None
+
+def _run_script(script, cwd=None):
+    """Выполнить скрипт в дочернем процессе так же, как `python script`."""
+    if cwd:
+        os.chdir(cwd)
+    sys.path.insert(0, os.path.dirname(script))
+    sys.argv = [script]
+    runpy.run_path(script, run_name="__main__")
+
+def _fast_spawn(argv, new_console=True, cwd=None):
+    """Windows: запустить процесс в отдельной консоли (на POSIX сервисы стартуют через forkserver)."""
+    # Popen здесь — это и так прямой CreateProcess; нужен только флаг новой консоли
+    flags = subprocess.CREATE_NEW_CONSOLE if new_console else 0
+    subprocess.Popen(argv, executable=argv[0], creationflags=flags, cwd=cwd)
+
+def run_process(name, script, cwd=None):
+    """Запустить сервис; на POSIX вернуть его Process (лаунчер ждёт его в main)."""
     print(f"Запускаем {name}…")
     try:
-        subprocess.Popen([sys.executable, *command], creationflags=subprocess.CREATE_NEW_CONSOLE)
+        if _MP is not None:
+            proc = _MP.Process(target=_run_script, args=(script, cwd), name=name)
+            proc.start()
+            return proc
+        _fast_spawn((_PY, script), cwd=cwd)
     except Exception as e:
         print(f"❌ Ошибка при запуске {name}: {e}")
+    return None
+
+def exec_process(name, script, cwd=None):
+    """Заменить процесс лаунчера дочерним (POSIX): без лишнего fork и висящего родителя."""
+    print(f"Запускаем {name}…")
+    print("\n✅ Лаунчер передаёт управление процессу. Чтобы остановить — нажми Ctrl+C.\n")
+    sys.stdout.flush()
+    if cwd:
+        os.chdir(cwd)
+    os.execv(_PY, (_PY, script))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Лаунчер Liberty Country: бот, админ-панель и сайт.")
+    parser.add_argument("--bot", action="store_true", help="запустить бота")
+    parser.add_argument("--admin", action="store_true", help="запустить админ-панель")
+    parser.add_argument("--site", action="store_true", help="запустить основной сайт")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
     print("=== Liberty Country Launcher ===")
     print("Этот скрипт запускает бота, админ-панель и сайт проекта Liberty Country.\n")
 
-    # Проверяем токен бота
-    token = os.getenv("DISCORD_TOKEN")
+    # Проверяем токен бота (окружение читаем один раз)
+    env = dict(os.environ)
+    token = env.get("DISCORD_TOKEN")
     if not token:
         print("⚠️ Переменная окружения DISCORD_TOKEN не задана. Бот может не запуститься.\n")
 
-    # Пользователь выбирает, что запускать
-    start_bot   = input("Запустить бота? (y/n): ").strip().lower() == "y"
-    start_admin = input("Запустить админ-панель? (y/n): ").strip().lower() == "y"
-    start_site  = input("Запустить основной сайт? (y/n): ").strip().lower() == "y"
+    # Что запускать: флаги командной строки, иначе — один вопрос пользователю
+    if args.bot or args.admin or args.site:
+        start_bot, start_admin, start_site = args.bot, args.admin, args.site
+    else:
+        choices = set(input("Запустить (b)ота, (a)дмин-панель, (s)айт? Например: bas: ").strip().lower())
+        start_bot, start_admin, start_site = "b" in choices, "a" in choices, "s" in choices
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    # один проход по каталогу вместо os.path.exists на каждый файл
+    present = {e.name for e in os.scandir(base_dir)}
+    tasks = []  # (name, script, cwd) — запускаются параллельно ниже
 
     if start_bot:
         bot_file = os.path.join(base_dir, "liberty_country_bot.py")
-        if os.path.exists(bot_file):
-            run_process("бота (liberty_country_bot.py)", [bot_file])
+        if "liberty_country_bot.py" in present:
+            tasks.append(("бота (liberty_country_bot.py)", bot_file, None))
         else:
             print("❌ Файл liberty_country_bot.py не найден.")
 
     if start_admin:
         admin_file = os.path.join(base_dir, "lc_admin_app.py")
         alt_admin = os.path.join(base_dir, "lc_admin_app_auth.py")
-        if os.path.exists(alt_admin):
-            run_process("админ-панель (с авторизацией)", [alt_admin])
-        elif os.path.exists(admin_file):
-            run_process("админ-панель", [admin_file])
+        if "lc_admin_app_auth.py" in present:
+            tasks.append(("админ-панель (с авторизацией)", alt_admin, None))
+        elif "lc_admin_app.py" in present:
+            tasks.append(("админ-панель", admin_file, None))
         else:
             print("❌ Файл админ-панели не найден.")
 
     if start_site:
         site_dir = os.path.join(base_dir, "lc_main_site")
         site_file = os.path.join(site_dir, "lc_main_site.py")
-        if os.path.exists(site_file):
-            os.chdir(site_dir)
-            run_process("основной сайт", [site_file])
+        site_present = {e.name for e in os.scandir(site_dir)} if "lc_main_site" in present else set()
+        if "lc_main_site.py" in site_present:
+            # сайт работает из своей папки — cwd задаётся только дочернему процессу
+            tasks.append(("основной сайт", site_file, site_dir))
         else:
             print("❌ Основной сайт (lc_main_site.py) не найден.")
 
-    print("\n✅ Все выбранные процессы запущены. Чтобы остановить — закрой консоли или нажми Ctrl+C.\n")
+    # Один сервис на POSIX — лаунчер сам становится им (на Windows нужна отдельная консоль)
+    if os.name != "nt" and len(tasks) == 1:
+        exec_process(*tasks[0])
+
+    # запуски не зависят друг от друга — перекрываем их по времени
+    procs = []
+    if tasks:
+        with ThreadPoolExecutor(max_workers=len(tasks)) as ex:
+            procs = [p for p in ex.map(lambda t: run_process(*t), tasks) if p is not None]
+
+    if not procs:
+        print("\n✅ Все выбранные процессы запущены. Чтобы остановить — закрой консоли или нажми Ctrl+C.\n")
+        return
+
+    # POSIX: сервисы — дочерние процессы лаунчера, он остаётся на переднем плане до их завершения.
+    # Ctrl+C получает вся группа процессов, так что сервисы останавливаются вместе с лаунчером.
+    print("\n✅ Все выбранные процессы запущены. Лаунчер работает, пока работают они; остановить всё — Ctrl+C.\n")
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        print("\n⏹ Останавливаем процессы…")
+        for p in procs:
+            p.join()
 
 if __name__ == "__main__":
     main()